@@ -9,6 +9,10 @@ class class_property:
     """Property that works on the class."""
 
 
+class aggregate:
+    """Class-level aggregate (sum, count, mean, min or max) of an attribute."""
+
+
 class class_only_method:
     """A method that can only be called at the class-level."""
 
@@ -4,6 +4,7 @@ import unittest
 
 
 from descriptors import (
+    aggregate,
     alias,
     class_property,
     class_only_method,
@@ -87,6 +88,36 @@ class AliasTests(unittest.TestCase):
         self.assertEqual(thing3.blue, [6])
         self.assertIs(thing3.blue, thing3.red)
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Dotted-path alias")
+    def test_dotted_path(self):
+        from types import SimpleNamespace
+        class Settings:
+            host = alias('config.db.host')
+            port = alias('config.db.port', write=True)
+            def __init__(self):
+                db = SimpleNamespace(host='localhost', port=5432)
+                self.config = SimpleNamespace(db=db)
+        settings = Settings()
+        self.assertEqual(settings.host, 'localhost')
+        self.assertEqual(settings.port, 5432)
+        settings.config.db.host = 'example.com'
+        self.assertEqual(settings.host, 'example.com')
+        settings.config.db = SimpleNamespace(host='db.local', port=1)
+        self.assertEqual(settings.host, 'db.local')
+        self.assertEqual(settings.port, 1)
+
+        # Unwritable by default
+        with self.assertRaises(AttributeError):
+            settings.host = 'other'
+        self.assertEqual(settings.config.db.host, 'db.local')
+
+        # Writes go to the innermost object when write=True specified
+        settings.port = 6543
+        self.assertEqual(settings.config.db.port, 6543)
+        self.assertEqual(settings.port, 6543)
+        self.assertNotIn('port', vars(settings))
+
 
 class ClassPropertyTests(unittest.TestCase):
 
@@ -170,6 +201,153 @@ class ClassPropertyTests(unittest.TestCase):
         self.assertEqual(account1.total_balance, 10)
         self.assertEqual(account2.total_balance, 15)
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Cached class property")
+    def test_cached_until_class_attribute_changes(self):
+        calls = []
+        class BankAccount:
+            accounts = []
+            def __init__(self, balance=0):
+                self.balance = balance
+                self.accounts.append(self)
+            @class_property(cached=True, watch=['accounts'])
+            def total_balance(cls):
+                calls.append(cls)
+                return sum(a.balance for a in cls.accounts)
+        class SavingsAccount(BankAccount):
+            accounts = []
+        account1 = BankAccount(5)
+        account2 = BankAccount(15)
+        self.assertEqual(BankAccount.total_balance, 20)
+        self.assertEqual(account1.total_balance, 20)
+        self.assertEqual(account2.total_balance, 20)
+        self.assertEqual(calls, [BankAccount])
+
+        # Mutating a watched container invalidates the cache
+        BankAccount(10)
+        self.assertEqual(BankAccount.total_balance, 30)
+        self.assertEqual(calls, [BankAccount, BankAccount])
+
+        # Subclasses are cached separately
+        SavingsAccount(1)
+        self.assertEqual(SavingsAccount.total_balance, 1)
+        self.assertEqual(BankAccount.total_balance, 30)
+        self.assertEqual(calls, [BankAccount, BankAccount, SavingsAccount])
+
+        # Rebinding a watched attribute invalidates the cache
+        BankAccount.accounts = [account1]
+        self.assertEqual(BankAccount.total_balance, 5)
+        self.assertEqual(SavingsAccount.total_balance, 1)
+        self.assertEqual(len(calls), 4)
+
+        # Instance attributes still shadow the class property
+        account1.total_balance = 100
+        self.assertEqual(account1.total_balance, 100)
+        self.assertEqual(account2.total_balance, 5)
+        del account1.total_balance
+        self.assertEqual(account1.total_balance, 5)
+
+
+class AggregateTests(unittest.TestCase):
+
+    """Tests for aggregate."""
+
+    def test_sum(self):
+        class BankAccount:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        self.assertEqual(BankAccount.total_balance, 0)
+        account1 = BankAccount(5)
+        account2 = BankAccount(15)
+        self.assertEqual(BankAccount.total_balance, 20)
+        self.assertEqual(account1.total_balance, 20)
+        self.assertEqual(account1.total_balance, account2.total_balance)
+
+    def test_setting_attribute_updates_aggregate(self):
+        class BankAccount:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        account1 = BankAccount(5)
+        account2 = BankAccount(15)
+        account1.balance = 10
+        self.assertEqual(BankAccount.total_balance, 25)
+        account2.balance += 5
+        self.assertEqual(BankAccount.total_balance, 30)
+        del account1.balance
+        self.assertEqual(BankAccount.total_balance, 20)
+        account1.balance = 1
+        self.assertEqual(BankAccount.total_balance, 21)
+
+    def test_deleted_instances_are_removed(self):
+        class BankAccount:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        account1 = BankAccount(5)
+        account2 = BankAccount(15)
+        self.assertEqual(BankAccount.total_balance, 20)
+        del account2
+        self.assertEqual(BankAccount.total_balance, 5)
+        del account1
+        self.assertEqual(BankAccount.total_balance, 0)
+
+    def test_count_mean_min_and_max(self):
+        class BankAccount:
+            count = aggregate('balance', 'count')
+            mean = aggregate('balance', 'mean')
+            smallest = aggregate('balance', 'min')
+            largest = aggregate('balance', 'max')
+            def __init__(self, balance=0):
+                self.balance = balance
+        self.assertEqual(BankAccount.count, 0)
+        accounts = [BankAccount(n) for n in (4, 8, 3, 9)]
+        self.assertEqual(BankAccount.count, 4)
+        self.assertEqual(BankAccount.mean, 6)
+        self.assertEqual(BankAccount.smallest, 3)
+        self.assertEqual(BankAccount.largest, 9)
+        accounts[2].balance = 5
+        accounts[3].balance = 6
+        self.assertEqual(BankAccount.mean, 5.75)
+        self.assertEqual(BankAccount.smallest, 4)
+        self.assertEqual(BankAccount.largest, 8)
+        del accounts[1]
+        self.assertEqual(BankAccount.count, 3)
+        self.assertEqual(BankAccount.mean, 5)
+        self.assertEqual(BankAccount.largest, 6)
+
+    def test_usage_on_two_classes_is_independent(self):
+        class BankAccount:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        class Wallet:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        account = BankAccount(5)
+        wallet = Wallet(2)
+        self.assertEqual(BankAccount.total_balance, 5)
+        self.assertEqual(Wallet.total_balance, 2)
+
+    def test_objects_are_garbage_collected_properly(self):
+        def count_instances(cls):
+            return sum(
+                isinstance(obj, cls)
+                for obj in gc.get_objects()
+            )
+        class BankAccount:
+            total_balance = aggregate('balance', 'sum')
+            def __init__(self, balance=0):
+                self.balance = balance
+        self.assertEqual(count_instances(BankAccount), 0)
+        account = BankAccount(5)
+        self.assertEqual(BankAccount.total_balance, 5)
+        self.assertEqual(count_instances(BankAccount), 1)
+        del account
+        self.assertEqual(count_instances(BankAccount), 0)
+
 
 class ClassOnlyMethodTests(unittest.TestCase):
 
@@ -254,6 +432,33 @@ class ClassOnlyMethodTests(unittest.TestCase):
         with self.assertRaises(AttributeError):
             del account2.total
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Cached class-bound method")
+    def test_bound_method_cached_per_class(self):
+        import weakref
+        class Thing:
+            @class_only_method
+            def stuff(cls):
+                """Do things."""
+                return cls
+        class Child(Thing):
+            pass
+        self.assertIs(Thing.stuff, Thing.stuff)
+        self.assertIs(Child.stuff, Child.stuff)
+        self.assertIsNot(Thing.stuff, Child.stuff)
+        self.assertIs(Thing.stuff(), Thing)
+        self.assertIs(Child.stuff(), Child)
+        self.assertIn('stuff', repr(Child.stuff))
+        self.assertIn('Do things', Child.stuff.__doc__)
+        with self.assertRaises(AttributeError):
+            Child().stuff
+
+        # Dynamically created classes can still be garbage collected
+        child = weakref.ref(Child)
+        del Child
+        gc.collect()
+        self.assertIsNone(child())
+
 
 class ComputedPropertyTests(unittest.TestCase):
 
@@ -397,6 +602,172 @@ class ComputedPropertyTests(unittest.TestCase):
         thing.y = 5
         self.assertEqual(Thing.x.__get__(thing, Thing), 5)
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Async getters")
+    def test_async_getter(self):
+        import asyncio
+        calls = []
+        class Thing:
+            @computed_property('y')
+            async def x(self):
+                calls.append(self.y)
+                await asyncio.sleep(0.01)
+                return self.y * 2
+        async def check():
+            thing = Thing()
+            thing.y = 2
+            # Concurrent awaiters share one call to the getter
+            self.assertEqual(await asyncio.gather(thing.x, thing.x), [4, 4])
+            self.assertEqual(calls, [2])
+            # Result is cached until the watched attribute changes
+            self.assertEqual(await thing.x, 4)
+            self.assertEqual(calls, [2])
+            thing.y = 3
+            self.assertEqual(await thing.x, 6)
+            self.assertEqual(await thing.x, 6)
+            self.assertEqual(calls, [2, 3])
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(check())
+        finally:
+            loop.close()
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Cache statistics")
+    def test_cache_statistics(self):
+        from time import sleep
+        class Thing:
+            @computed_property('y')
+            def x(self):
+                sleep(0.001)
+                return self.y
+            @computed_property('y', per_instance=True)
+            def w(self):
+                return self.y
+        thing1, thing2 = Thing(), Thing()
+        thing1.y = thing2.y = 1
+        stats = Thing.x.stats
+        self.assertEqual((stats.hits, stats.misses, stats.recomputes), (0, 0, 0))
+        self.assertEqual(thing1.x, 1)
+        self.assertEqual(thing1.x, 1)
+        self.assertEqual(thing2.x, 1)
+        self.assertEqual((stats.hits, stats.misses, stats.recomputes), (1, 2, 0))
+        thing1.y = 2
+        self.assertEqual(thing1.x, 2)
+        self.assertEqual((stats.hits, stats.misses, stats.recomputes), (1, 2, 1))
+        self.assertGreaterEqual(stats.time, 0.003)
+
+        # Per-instance statistics when per_instance=True specified
+        for i in range(3):
+            self.assertEqual(thing1.w, 2)
+        self.assertEqual(thing2.w, 1)
+        stats1 = Thing.w.stats_for(thing1)
+        stats2 = Thing.w.stats_for(thing2)
+        self.assertEqual((stats1.hits, stats1.misses, stats1.recomputes), (2, 1, 0))
+        self.assertEqual((stats2.hits, stats2.misses, stats2.recomputes), (0, 1, 0))
+        self.assertEqual(Thing.w.stats.hits, 2)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Explicit invalidation")
+    def test_invalidation(self):
+        class Thing:
+            @computed_property('y')
+            def x(self):
+                return self.y * self.z
+        thing1, thing2 = Thing(), Thing()
+        thing1.y = thing1.z = thing2.y = thing2.z = 2
+        self.assertEqual(thing1.x, 4)
+        self.assertEqual(thing2.x, 4)
+        thing1.z = thing2.z = 3
+        self.assertEqual(thing1.x, 4)
+        Thing.x.invalidate(thing1)
+        self.assertEqual(thing1.x, 6)
+        self.assertEqual(thing2.x, 4)
+        thing1.z = thing2.z = 5
+        Thing.x.invalidate_all()
+        self.assertEqual(thing1.x, 10)
+        self.assertEqual(thing2.x, 10)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Time-based expiry")
+    def test_ttl(self):
+        from time import sleep
+        class Thing:
+            @computed_property('y', ttl=0.05)
+            def x(self):
+                return self.y * self.z
+        thing = Thing()
+        thing.y, thing.z = 2, 3
+        self.assertEqual(thing.x, 6)
+        thing.z = 4
+        self.assertEqual(thing.x, 6)
+        sleep(0.06)
+        self.assertEqual(thing.x, 8)
+        thing.y = 3
+        self.assertEqual(thing.x, 12)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Instance dictionary caching")
+    def test_value_stored_in_instance_dictionary(self):
+        class Thing:
+            @computed_property('y', fast=True)
+            def x(self):
+                return self.y * self.z
+        thing = Thing()
+        self.assertEqual(type(Thing.x), computed_property)
+        # Cached values must win over the descriptor, so it can't define
+        # __set__ or __delete__ (setting x is refused by the class instead)
+        self.assertFalse(hasattr(vars(Thing)['x'], '__set__'))
+        self.assertFalse(hasattr(vars(Thing)['x'], '__delete__'))
+        thing.y, thing.z = 2, 3
+        self.assertEqual(thing.x, 6)
+        self.assertEqual(vars(thing)['x'], 6)
+        thing.z = 4
+        self.assertEqual(thing.x, 6)
+        thing.y = 3
+        self.assertNotIn('x', vars(thing))
+        self.assertEqual(thing.x, 12)
+        del thing.y
+        self.assertNotIn('x', vars(thing))
+        with self.assertRaises(AttributeError):
+            thing.x
+        thing.y = 5
+        self.assertEqual(Thing.x.__get__(thing, Thing), 20)
+        with self.assertRaises(AttributeError):
+            thing.x = 2
+        self.assertEqual(thing.x, 20)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Bulk warm-up")
+    def test_warming_many_instances(self):
+        from concurrent.futures import ThreadPoolExecutor
+        calls = []
+        class Thing:
+            def __init__(self, y):
+                self.y = y
+            @computed_property('y')
+            def x(self):
+                calls.append(self.y)
+                return self.y * 2
+        things = [Thing(n) for n in range(100)]
+        self.assertEqual(things[0].x, 0)
+        self.assertEqual(things[1].x, 2)
+
+        # Fresh instances are skipped
+        with ThreadPoolExecutor(4) as executor:
+            Thing.x.warm(things, executor=executor)
+        self.assertEqual(sorted(calls), list(range(100)))
+        calls.clear()
+        self.assertEqual([t.x for t in things], [n * 2 for n in range(100)])
+        self.assertEqual(calls, [])
+
+        # Computed serially when no executor specified
+        things[5].y = 50
+        Thing.x.warm(things)
+        self.assertEqual(calls, [50])
+        self.assertEqual(things[5].x, 100)
+        self.assertEqual(calls, [50])
+
 
 if __name__ == "__main__":
     from helpers import error_message
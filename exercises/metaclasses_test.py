@@ -1,5 +1,6 @@
 """Tests for metaclass exercises"""
 from collections import OrderedDict, defaultdict, Counter, UserDict
+import gc
 import unittest
 
 from metaclasses import (
@@ -59,6 +60,39 @@ class UnsubclassableTypeTests(unittest.TestCase):
         a.x = 4
         self.assertEqual(a.x, 4)
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Generated slots")
+    def test_generated_slots(self):
+        class Point(metaclass=UnsubclassableType, slots=True):
+            def __init__(self, x, y, z=0):
+                self.x, self.y = x, y
+                if z:
+                    self.z = z
+            def __repr__(self):
+                return "Point({}, {})".format(self.x, self.y)
+        self.assertEqual(set(Point.__slots__), {'x', 'y', 'z'})
+        p = Point(1, 2)
+        self.assertEqual((p.x, p.y), (1, 2))
+        self.assertEqual(repr(p), "Point(1, 2)")
+        self.assertFalse(hasattr(p, '__dict__'))
+        self.assertEqual(Point(1, 2, 3).z, 3)
+        p.x = 4
+        self.assertEqual(p.x, 4)
+        with self.assertRaises(AttributeError):
+            p.w = 4
+
+        # The class namespace is frozen after creation
+        with self.assertRaises(TypeError):
+            Point.w = 4
+        with self.assertRaises(TypeError):
+            del Point.__repr__
+        self.assertEqual(repr(p), "Point(4, 2)")
+
+        # Still unsubclassable
+        with self.assertRaises(TypeError):
+            class Point3D(Point):
+                pass
+
 
 class InstanceTrackerTests(unittest.TestCase):
 
@@ -106,6 +140,172 @@ class InstanceTrackerTests(unittest.TestCase):
         self.assertEqual(set(B), {b})
         self.assertEqual(set(A), {a})
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Garbage collection")
+    def test_objects_are_garbage_collected_properly(self):
+        def count_instances(cls):
+            return sum(
+                isinstance(obj, cls)
+                for obj in gc.get_objects()
+            )
+        class BankAccount(metaclass=InstanceTracker):
+            def __init__(self, balance=0):
+                self.balance = balance
+        self.assertEqual(count_instances(BankAccount), 0)
+        account1 = BankAccount(5)
+        account2 = BankAccount(10)
+        self.assertEqual(count_instances(BankAccount), 2)
+        del account1
+        self.assertEqual(count_instances(BankAccount), 1)
+        self.assertEqual(set(BankAccount), {account2})
+        accounts = [BankAccount(n) for n in range(100)]
+        del accounts
+        self.assertEqual(count_instances(BankAccount), 1)
+        self.assertEqual(set(BankAccount), {account2})
+
+        # Iteration works on a snapshot of the tracked instances
+        seen = []
+        for account in BankAccount:
+            seen.append(account)
+            BankAccount(0)
+        self.assertEqual(seen, [account2])
+        del seen, account
+        self.assertEqual(count_instances(BankAccount), 1)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Indexed lookups")
+    def test_indexed_lookups(self):
+        class BankAccount(
+                metaclass=InstanceTracker,
+                index=['owner'],
+                sorted_index=['balance']):
+            def __init__(self, owner, balance=0):
+                self.owner = owner
+                self.balance = balance
+        trey = BankAccount('Trey', 50)
+        diane = BankAccount('Diane', 5)
+        trey2 = BankAccount('Trey', 150)
+        self.assertEqual(set(BankAccount.where(owner='Trey')), {trey, trey2})
+        self.assertEqual(set(BankAccount.where(owner='Diane')), {diane})
+        self.assertEqual(set(BankAccount.where(owner='Nobody')), set())
+        self.assertEqual(list(BankAccount.range('balance', 5, 150)), [diane, trey])
+        self.assertEqual(list(BankAccount.range('balance', 10, 1000)), [trey, trey2])
+
+        # Indexes follow attribute changes
+        diane.owner = 'Trey'
+        trey2.balance = 20
+        self.assertEqual(set(BankAccount.where(owner='Trey')), {trey, trey2, diane})
+        self.assertEqual(set(BankAccount.where(owner='Diane')), set())
+        self.assertEqual(list(BankAccount.range('balance', 10, 1000)), [trey2, trey])
+
+        # Indexes forget instances once they're garbage collected
+        del trey2
+        self.assertEqual(set(BankAccount.where(owner='Trey')), {trey, diane})
+        self.assertEqual(list(BankAccount.range('balance', 10, 1000)), [trey])
+
+        # Only declared attributes can be queried
+        with self.assertRaises(ValueError):
+            BankAccount.where(balance=5)
+        with self.assertRaises(ValueError):
+            BankAccount.range('owner', 'A', 'Z')
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Columnar attributes")
+    def test_columnar_attributes(self):
+        class BankAccount(metaclass=InstanceTracker, columns={'balance': 'd'}):
+            def __init__(self, owner, balance=0):
+                self.owner = owner
+                self.balance = balance
+        accounts = [BankAccount('Trey', n) for n in range(10)]
+        self.assertEqual(BankAccount.sum('balance'), 45)
+        self.assertEqual(BankAccount.mean('balance'), 4.5)
+
+        # Attribute access on instances still works
+        self.assertEqual(accounts[3].balance, 3)
+        self.assertEqual(type(accounts[3].balance), float)
+        self.assertEqual(accounts[3].owner, 'Trey')
+        accounts[3].balance += 10
+        self.assertEqual(accounts[3].balance, 13)
+        self.assertEqual(BankAccount.sum('balance'), 55)
+
+        # Garbage collected instances no longer count
+        del accounts[3:]
+        self.assertEqual(BankAccount.sum('balance'), 3)
+        self.assertEqual(BankAccount.mean('balance'), 1)
+        accounts.append(BankAccount('Diane', 17))
+        self.assertEqual(BankAccount.sum('balance'), 20)
+        self.assertEqual(BankAccount.mean('balance'), 5)
+        self.assertEqual([a.balance for a in accounts], [0, 1, 2, 17])
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Threads and partitioning")
+    def test_threaded_creation_and_partitioning(self):
+        from concurrent.futures import ThreadPoolExecutor
+        class BankAccount(metaclass=InstanceTracker):
+            def __init__(self, balance=0):
+                self.balance = balance
+        def open_accounts(start):
+            return [BankAccount(n) for n in range(start, start+500)]
+        with ThreadPoolExecutor(8) as executor:
+            batches = list(executor.map(open_accounts, range(0, 4000, 500)))
+        accounts = {account for batch in batches for account in batch}
+        self.assertEqual(len(accounts), 4000)
+        self.assertEqual(set(BankAccount), accounts)
+
+        # Partitions split one snapshot into nearly equal chunks
+        chunks = [list(chunk) for chunk in BankAccount.partition(3)]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sorted(len(chunk) for chunk in chunks), [1333, 1333, 1334])
+        self.assertEqual(set().union(*chunks), accounts)
+        with ThreadPoolExecutor(3) as executor:
+            totals = executor.map(
+                lambda chunk: sum(a.balance for a in chunk),
+                BankAccount.partition(3),
+            )
+            self.assertEqual(sum(totals), sum(range(4000)))
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Including subclasses")
+    def test_including_subclasses(self):
+        class Animal(metaclass=InstanceTracker, include_subclasses=True):
+            def __init__(self, name):
+                self.name = name
+        class Squirrel(Animal):
+            pass
+        class FlyingSquirrel(Squirrel):
+            pass
+        class Plant(metaclass=InstanceTracker):
+            pass
+        class Tree(Plant):
+            pass
+        animal = Animal('Fido')
+        squirrel1 = Squirrel('Mike')
+        squirrel2 = Squirrel('Carol')
+        flyer = FlyingSquirrel('Rocky')
+        self.assertEqual(set(Animal), {animal, squirrel1, squirrel2, flyer})
+        self.assertEqual(set(Squirrel), {squirrel1, squirrel2, flyer})
+        self.assertEqual(set(FlyingSquirrel), {flyer})
+        self.assertEqual(len(Animal), 4)
+        self.assertEqual(len(list(Animal)), 4)
+        self.assertEqual(len(Squirrel), 3)
+
+        # Subclasses reached along two paths are only counted once
+        class Glider(Animal):
+            pass
+        class SugarGlider(Squirrel, Glider):
+            pass
+        glider = SugarGlider('Sugar')
+        self.assertEqual(len(Animal), 5)
+        self.assertEqual(len(list(Animal)), 5)
+        self.assertEqual(set(Glider), {glider})
+        self.assertEqual(set(Squirrel), {squirrel1, squirrel2, flyer, glider})
+
+        # Tracking stays per-class without include_subclasses
+        plant = Plant()
+        tree = Tree()
+        self.assertEqual(set(Plant), {plant})
+        self.assertEqual(set(Tree), {tree})
+
 
 class MappingTests(unittest.TestCase):
 
@@ -161,6 +361,55 @@ class MappingTests(unittest.TestCase):
         self.assertTrue(isinstance(MyMapping({1: 2, 3: 4}), Mapping))
         self.assertTrue(issubclass(MyMapping, Mapping))
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Cached checks")
+    def test_checks_follow_class_changes(self):
+        import weakref
+        class Growing:
+            def __getitem__(self, key):
+                return key
+            def __iter__(self):
+                return iter(())
+            def __len__(self):
+                return 0
+        class Child(Growing):
+            pass
+        for i in range(3):
+            self.assertFalse(isinstance(Growing(), Mapping))
+            self.assertFalse(issubclass(Child, Mapping))
+        Growing.keys = lambda self: []
+        Growing.values = lambda self: []
+        Growing.items = lambda self: []
+        self.assertTrue(isinstance(Growing(), Mapping))
+        self.assertTrue(issubclass(Child, Mapping))
+        del Growing.keys
+        self.assertFalse(isinstance(Growing(), Mapping))
+        self.assertFalse(isinstance(Child(), Mapping))
+
+        # Checked classes can still be garbage collected
+        growing, child = weakref.ref(Growing), weakref.ref(Child)
+        del Growing, Child
+        gc.collect()
+        self.assertIsNone(growing())
+        self.assertIsNone(child())
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Bulk classification")
+    def test_classify(self):
+        from itertools import count, islice
+        objects = [{}, [], Counter('hi'), 'hello', UserDict(), (1, 2), {}]
+        self.assertEqual(
+            list(Mapping.classify(objects)),
+            [True, False, True, False, True, False, True],
+        )
+        self.assertEqual(list(Mapping.classify([])), [])
+        self.assertEqual(list(Mapping.classify(iter(objects))), [
+            isinstance(obj, Mapping)
+            for obj in objects
+        ])
+        flags = Mapping.classify({n: n} if n % 3 else n for n in count())
+        self.assertEqual(list(islice(flags, 6)), [False, True, True] * 2)
+
 
 class HashableTests(unittest.TestCase):
 
@@ -229,6 +478,79 @@ class HashableTests(unittest.TestCase):
         self.assertTrue(isinstance(SometimesHashable(True), Hashable))
         self.assertFalse(isinstance(SometimesHashable(False), Hashable))
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Cached checks")
+    def test_checks_follow_class_changes(self):
+        import weakref
+        class Toggle:
+            pass
+        class Child(Toggle):
+            pass
+        for i in range(3):
+            self.assertTrue(issubclass(Toggle, Hashable))
+            self.assertTrue(isinstance(Child(), Hashable))
+        Toggle.__hash__ = None
+        self.assertFalse(issubclass(Toggle, Hashable))
+        self.assertFalse(isinstance(Toggle(), Hashable))
+        self.assertFalse(isinstance(Child(), Hashable))
+        del Toggle.__hash__
+        self.assertTrue(issubclass(Child, Hashable))
+        self.assertTrue(isinstance(Toggle(), Hashable))
+
+        # Checked classes can still be garbage collected
+        toggle, child = weakref.ref(Toggle), weakref.ref(Child)
+        del Toggle, Child
+        gc.collect()
+        self.assertIsNone(toggle())
+        self.assertIsNone(child())
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Deep and large containers")
+    def test_deeply_nested_and_large_tuples(self):
+        class SometimesHashable:
+            def __init__(self, hashable=True):
+                self.hashable = hashable
+            def __hash__(self):
+                if not self.hashable:
+                    raise TypeError("Unhashable object")
+                return id(self)
+        def nest(innermost, depth=10000):
+            for i in range(depth):
+                innermost = (innermost, i)
+            return innermost
+        self.assertTrue(isinstance(nest('apple'), Hashable))
+        self.assertTrue(isinstance(nest(SometimesHashable(True)), Hashable))
+        self.assertFalse(isinstance(nest([]), Hashable))
+        self.assertFalse(isinstance(nest(SometimesHashable(False)), Hashable))
+        self.assertFalse(isinstance(nest(({}, 'b')), Hashable))
+        large = tuple(range(1000000))
+        self.assertTrue(isinstance(large, Hashable))
+        self.assertTrue(isinstance((large, ('a', large)), Hashable))
+        self.assertFalse(isinstance(([],) + large, Hashable))
+        self.assertFalse(isinstance(large + ([],), Hashable))
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Bulk classification")
+    def test_classify(self):
+        from itertools import count, islice
+        class SometimesHashable:
+            def __init__(self, hashable=True):
+                self.hashable = hashable
+            def __hash__(self):
+                if not self.hashable:
+                    raise TypeError("Unhashable object")
+                return id(self)
+        objects = [
+            1, [], 'hello', (1, 2), (1, []), SometimesHashable(True),
+            SometimesHashable(False), {}, (3, 4), ('a', {}),
+        ]
+        self.assertEqual(list(Hashable.classify(objects)), [
+            True, False, True, True, False, True, False, False, True, False,
+        ])
+        self.assertEqual(list(Hashable.classify([])), [])
+        flags = Hashable.classify((n,) if n % 2 else [n] for n in count())
+        self.assertEqual(list(islice(flags, 4)), [False, True, False, True])
+
 
 class NoMethodCollisionsTests(unittest.TestCase):
 
@@ -310,6 +632,61 @@ class NoMethodCollisionsTests(unittest.TestCase):
         self.assertEqual(c2.diameter, 10)
         self.assertEqual(c2.radius, 5)
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Report all collisions")
+    def test_report_all_collisions(self):
+        with self.assertRaises(TypeError) as context:
+            class SillyTests(NoMethodCollisions, report_all=True):
+                def test_add(self):
+                    self.assertEqual(2 + 2, 4)
+                def test_multiply(self):
+                    self.assertEqual(2 * 2, 4)
+                def test_add(self):
+                    self.assertEqual(1 + 1, 2)
+                def test_multiply(self):
+                    self.assertEqual(1 * 1, 1)
+        message = str(context.exception)
+        self.assertIn('test_add', message)
+        self.assertIn('test_multiply', message)
+
+        # Property redefinition is still allowed
+        class Circle(NoMethodCollisions, report_all=True):
+            def __init__(self, radius=1):
+                self.radius = radius
+            @property
+            def diameter(self):
+                return self.radius * 2
+            @diameter.setter
+            def diameter(self, diameter):
+                self.radius = diameter / 2
+        c = Circle(5)
+        c.diameter = 4
+        self.assertEqual(c.radius, 2)
+
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Many attributes")
+    def test_many_class_attributes(self):
+        from types import new_class
+        def make_body(names):
+            def body(namespace):
+                for name in names:
+                    namespace[name] = lambda self, name=name: name
+            return body
+        names = ['method_{}'.format(n) for n in range(10000)]
+        Big = new_class('Big', (NoMethodCollisions,), {}, make_body(names))
+        self.assertEqual(Big().method_9999(), 'method_9999')
+        with self.assertRaises(TypeError):
+            new_class('Big', (NoMethodCollisions,), {}, make_body(names * 2))
+        with self.assertRaises(TypeError) as context:
+            new_class(
+                'Big',
+                (NoMethodCollisions,),
+                {'report_all': True},
+                make_body(names + names[:3]),
+            )
+        for name in names[:3]:
+            self.assertIn(name, str(context.exception))
+
 
 class SnakeTestCaseTests(unittest.TestCase):
 
@@ -403,6 +780,36 @@ class SnakeTestCaseTests(unittest.TestCase):
             ["class up", *(("up", "down")*3), "class down"],
         )
 
+    # To test the Bonus part of this exercise, comment out the following line
+    @unittest.skip("Names resolved on the class")
+    def test_names_resolved_on_class(self):
+        class SnakeTest(SnakeTestCase):
+            def set_up(self):
+                self.value = 4
+            def tear_down(self):
+                del self.value
+            def checkValue(self, expected):
+                self.assert_equal(self.value, expected)
+            def test_value(self):
+                self.check_value(4)
+            def test_value_again(self):
+                self.check_value(4)
+
+        # Snake case hooks are bound when the class is created
+        self.assertIs(vars(SnakeTest)['setUp'], vars(SnakeTest)['set_up'])
+        self.assertIs(vars(SnakeTest)['tearDown'], vars(SnakeTest)['tear_down'])
+
+        # TestCase methods are available on the class itself
+        self.assertIs(SnakeTest.assert_equal, unittest.TestCase.assertEqual)
+        self.assertIs(SnakeTest.assert_true, unittest.TestCase.assertTrue)
+        self.assertIs(SnakeTest.short_description, unittest.TestCase.shortDescription)
+
+        # Other translations are cached on the class after first use
+        self.assertNotIn('check_value', vars(SnakeTest))
+        self.run_test(SnakeTest)
+        self.assertIn('check_value', vars(SnakeTest))
+        self.assertIs(SnakeTest.check_value, SnakeTest.checkValue)
+
 
 if __name__ == "__main__":
     from helpers import error_message
@@ -1,20 +1,642 @@
 #!/usr/bin/env python3
 from __future__ import print_function
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+import hashlib
+import importlib
+import importlib.util
+import io
+import json
+import os
 import sys
+import time
+import traceback
 import unittest
 
+import test_data
 from test_data import MODULES, TESTS
 
 
-def get_test(obj_name):
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(HERE, '.test_cache.json')
+
+
+def get_test_name(obj_name):
     if obj_name not in TESTS:
         raise SystemExit("Test for {} doesn't exist.".format(obj_name))
-    return unittest.defaultTestLoader.loadTestsFromName(TESTS[obj_name])
+    return TESTS[obj_name]
+
+
+def get_test(obj_name):
+    return unittest.defaultTestLoader.loadTestsFromName(get_test_name(obj_name))
 
 
 def run_tests(tests):
     test_suite = unittest.TestSuite(tests)
-    unittest.TextTestRunner().run(test_suite)
+    return unittest.TextTestRunner().run(test_suite).wasSuccessful()
+
+
+clock = getattr(time, 'perf_counter_ns', lambda: int(time.perf_counter() * 1e9))
+
+
+class SummaryResult(unittest.TestResult):
+
+    """Test result which records outcomes as plain, picklable data."""
+
+    def __init__(self):
+        super().__init__()
+        self.progress = []
+        self.durations = []
+        self.outcome = None
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.outcome = None
+        self.started = clock()
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.durations.append([test.id(), self.outcome, clock() - self.started])
+
+    def record(self, character, outcome):
+        self.progress.append(character)
+        self.outcome = outcome
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self.record('.', 'success')
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self.record('E', 'error')
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self.record('F', 'failure')
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is None:
+            return
+        if issubclass(err[0], test.failureException):
+            character, outcome = 'F', 'failure'
+        else:
+            character, outcome = 'E', 'error'
+        self.progress.append(character)
+        if self.outcome != 'error':
+            self.outcome = outcome
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self.record('s', 'skipped')
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self.record('x', 'expected failure')
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self.record('u', 'unexpected success')
+
+    def summary(self, output=''):
+        return {
+            'progress': ''.join(self.progress),
+            'output': output,
+            'tests_run': self.testsRun,
+            'errors': describe_problems(self.errors),
+            'failures': describe_problems(self.failures),
+            'skipped': len(self.skipped),
+            'expected_failures': len(self.expectedFailures),
+            'unexpected_successes': len(self.unexpectedSuccesses),
+            'durations': self.durations,
+        }
+
+
+class TimedSuite(unittest.TestSuite):
+
+    """Test suite which also records how long class fixtures take."""
+
+    def _handleClassSetUp(self, test, result):
+        if getattr(result, '_previousTestClass', None) == test.__class__:
+            return super()._handleClassSetUp(test, result)
+        self.time_fixture(
+            test.__class__, 'setUpClass', result,
+            super()._handleClassSetUp, test, result,
+        )
+
+    def _tearDownPreviousClass(self, test, result):
+        previous_class = getattr(result, '_previousTestClass', None)
+        if previous_class in (None, test.__class__):
+            return super()._tearDownPreviousClass(test, result)
+        self.time_fixture(
+            previous_class, 'tearDownClass', result,
+            super()._tearDownPreviousClass, test, result,
+        )
+
+    def time_fixture(self, cls, name, result, function, *args):
+        errors = len(result.errors)
+        start = clock()
+        function(*args)
+        if hasattr(result, 'durations'):
+            result.durations.append([
+                '{}.{}.{}'.format(cls.__module__, cls.__qualname__, name),
+                'error' if len(result.errors) > errors else 'success',
+                clock() - start,
+            ])
+
+
+timed_loader = unittest.TestLoader()
+timed_loader.suiteClass = TimedSuite
+
+
+def describe_problems(problems):
+    """Return (description, traceback) pairs like TextTestResult prints."""
+    return [
+        ('\n'.join(filter(None, [str(test), test.shortDescription()])), tb)
+        for test, tb in problems
+    ]
+
+
+def run_test_class(obj_name):
+    """Run the tests for one exercise and return a summary of the result."""
+    result = SummaryResult()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        suite = TimedSuite([
+            timed_loader.loadTestsFromName(get_test_name(obj_name)),
+        ])
+        result.startTestRun()
+        try:
+            suite.run(result)
+        finally:
+            result.stopTestRun()
+    return result.summary(output.getvalue())
+
+
+def map_test_classes(obj_names, jobs=1):
+    """Yield a summary of each exercise's tests, in order, using jobs processes.
+
+    With more than one job, each exercise gets a fresh worker process, so no
+    modules or state are shared between test classes.
+    """
+    if jobs == 1:
+        yield from map(run_test_class, obj_names)
+    else:
+        with Pool(jobs, maxtasksperchild=1) as pool:
+            yield from pool.imap(run_test_class, obj_names)
+
+
+def run_test_summaries(obj_names, jobs=1, cache=None):
+    """Run the tests for each exercise and return their summaries by name.
+
+    Results are reported in the order given, whatever order they finish in.
+    When a cache is given, passing results for unchanged exercises are
+    reused from it and it is updated with the new results.
+    """
+    keys = {}
+    cached = OrderedDict()
+    if cache is not None:
+        for obj_name in obj_names:
+            keys[obj_name] = source_key(obj_name)
+            entry = cache.get(obj_name)
+            if keys[obj_name] and entry and entry['key'] == keys[obj_name]:
+                cached[obj_name] = entry['summary']
+        if cached:
+            print("Reusing passing results for unchanged {}\n".format(
+                ', '.join(cached),
+            ))
+    results = map_test_classes(
+        [obj_name for obj_name in obj_names if obj_name not in cached],
+        jobs,
+    )
+    summaries = OrderedDict()
+    for obj_name in obj_names:
+        summary = cached.get(obj_name) or next(results)
+        sys.stdout.write(summary['output'])
+        sys.stdout.flush()
+        sys.stderr.write(summary['progress'])
+        sys.stderr.flush()
+        summaries[obj_name] = summary
+        if cache is not None and obj_name not in cached:
+            if keys[obj_name] and was_successful(summary):
+                cache[obj_name] = {'key': keys[obj_name], 'summary': summary}
+            else:
+                cache.pop(obj_name, None)
+    return summaries
+
+
+def test_durations(summaries):
+    """Return (exercise, test id, outcome, nanoseconds) for each timing."""
+    return [
+        (obj_name, test_id, outcome, duration)
+        for obj_name, summary in summaries.items()
+        for test_id, outcome, duration in summary.get('durations', [])
+    ]
+
+
+def print_durations(summaries, count):
+    """Print the count slowest tests and class fixtures (all if count is 0)."""
+    durations = sorted(
+        test_durations(summaries),
+        key=lambda timing: timing[3],
+        reverse=True,
+    )
+    if count:
+        durations = durations[:count]
+    print("\nSlowest {} durations:\n".format(len(durations)))
+    for obj_name, test_id, outcome, duration in durations:
+        print("{:9.4f}s {:<8} {}".format(duration / 1e9, outcome, test_id))
+    print()
+
+
+def write_json_report(summaries, path, time_taken):
+    report = {
+        'python': sys.version,
+        'time_taken': time_taken,
+        'tests': [
+            {
+                'exercise': obj_name,
+                'id': test_id,
+                'outcome': outcome,
+                'duration_ns': duration,
+            }
+            for obj_name, test_id, outcome, duration in test_durations(summaries)
+        ],
+        'results': summaries,
+    }
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+def load_json_report(path):
+    try:
+        with open(path) as report_file:
+            return json.load(report_file, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError) as error:
+        raise SystemExit("Could not read report {}: {}".format(path, error))
+
+
+def load_timings(path):
+    """Return the total nanoseconds each exercise took in a JSON report."""
+    timings = {}
+    for test in load_json_report(path).get('tests', []):
+        exercise = test['exercise']
+        timings[exercise] = timings.get(exercise, 0) + test['duration_ns']
+    return timings
+
+
+def select_shard(obj_names, shard, shard_count, timings=None):
+    """Return the obj_names in the given shard, numbered from 1.
+
+    With timings from an earlier run, exercises are spread so that each shard
+    takes about the same time, longest first. Otherwise, or if the timings
+    cover none of obj_names, they are dealt out so that each shard has about
+    the same number of exercises.
+    """
+    known = [timings[name] for name in obj_names if name in (timings or {})]
+    if not known:
+        return obj_names[shard-1::shard_count]
+    default = sum(known) / len(known)
+    loads = [0] * shard_count
+    counts = [0] * shard_count
+    assigned = {}
+    by_time = sorted(
+        enumerate(obj_names),
+        key=lambda item: (-timings.get(item[1], default), item[0]),
+    )
+    for index, obj_name in by_time:
+        target = min(
+            range(shard_count),
+            key=lambda i: (loads[i], counts[i], i),
+        )
+        assigned[obj_name] = target
+        loads[target] += timings.get(obj_name, default)
+        counts[target] += 1
+    return [
+        obj_name
+        for obj_name in obj_names
+        if assigned[obj_name] == shard - 1
+    ]
+
+
+def combine_reports(paths, json_path=None):
+    """Print one report for the results in the JSON reports at paths."""
+    if not paths:
+        raise SystemExit("--combine needs at least one report file.")
+    summaries = OrderedDict()
+    time_taken = 0
+    for path in paths:
+        report = load_json_report(path)
+        summaries.update(report.get('results', {}))
+        time_taken = max(time_taken, report.get('time_taken', 0))
+    ordered = OrderedDict(
+        (obj_name, summaries.pop(obj_name))
+        for obj_name in TESTS
+        if obj_name in summaries
+    )
+    ordered.update(summaries)
+    print("Combined results for {}\n".format(', '.join(ordered)))
+    for summary in ordered.values():
+        sys.stdout.write(summary['output'])
+        sys.stderr.write(summary['progress'])
+    successful = print_report(list(ordered.values()), time_taken)
+    if json_path:
+        write_json_report(ordered, json_path, time_taken)
+    if not successful:
+        sys.exit(1)
+
+
+def was_successful(summary):
+    return not (
+        summary['errors']
+        or summary['failures']
+        or summary['unexpected_successes']
+    )
+
+
+def source_key(obj_name):
+    """Return a hash of the Python version and the files obj_name's tests use.
+
+    Returns None if one of those files is missing.
+    """
+    digest = hashlib.sha256(sys.version.encode())
+    for module in source_modules(obj_name):
+        try:
+            with open(os.path.join(HERE, module + '.py'), 'rb') as source:
+                digest.update(source.read())
+        except OSError:
+            return None
+    return digest.hexdigest()
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_cache(cache):
+    temporary_file = CACHE_FILE + '.tmp'
+    with open(temporary_file, 'w') as cache_file:
+        json.dump(cache, cache_file)
+    os.replace(temporary_file, CACHE_FILE)
+
+
+def print_report(summaries, time_taken, stream=sys.stderr):
+    """Print the combined result of summaries like TextTestRunner does.
+
+    Returns whether every test passed.
+    """
+    separator1, separator2 = '=' * 70, '-' * 70
+    stream.write('\n')
+    for flavour, key in [('ERROR', 'errors'), ('FAIL', 'failures')]:
+        for summary in summaries:
+            for description, problem in summary[key]:
+                stream.write('{}\n{}: {}\n{}\n'.format(
+                    separator1, flavour, description, separator2,
+                ))
+                stream.write('{}\n'.format(problem))
+    run = sum(summary['tests_run'] for summary in summaries)
+    stream.write('{}\nRan {} test{} in {:.3f}s\n\n'.format(
+        separator2, run, '' if run == 1 else 's', time_taken,
+    ))
+    counts = [
+        ('failures', sum(len(s['failures']) for s in summaries)),
+        ('errors', sum(len(s['errors']) for s in summaries)),
+        ('skipped', sum(s['skipped'] for s in summaries)),
+        ('expected failures', sum(s['expected_failures'] for s in summaries)),
+        ('unexpected successes', sum(
+            s['unexpected_successes'] for s in summaries
+        )),
+    ]
+    details = ', '.join(
+        '{}={}'.format(name, count)
+        for name, count in counts
+        if count
+    )
+    failed = counts[0][1] or counts[1][1] or counts[4][1]
+    status = 'FAILED' if failed else 'OK'
+    stream.write('{} ({})\n'.format(status, details) if details else status + '\n')
+    stream.flush()
+    return not failed
+
+
+def watch(obj_names=None, interval=0.1):
+    """Re-run the tests affected by each change to the watched files.
+
+    Exercise and test modules are imported once, up front. Each run happens
+    in a forked child of this process, so only changed modules and the test
+    modules that use them are imported again. No bytecode is written while
+    watching, since it can't tell apart saves made within the same second.
+
+    Tests are discovered again whenever a test file or exercise module is
+    added, removed or changed. Without obj_names, every exercise is watched,
+    including ones added while watching.
+    """
+    sys.dont_write_bytecode = True
+    watch_all = obj_names is None
+    if watch_all:
+        obj_names = list(TESTS)
+    key = test_data.discovery_key()
+    dependents = find_dependents(obj_names)
+    warm_up(dependents)
+    print("Watching {} for changes (press Ctrl-C to stop)\n".format(
+        ', '.join(module + '.py' for module in dependents),
+    ))
+    mtimes = source_mtimes(dependents)
+    run_forked(obj_names)
+    try:
+        while True:
+            time.sleep(interval)
+            previous_key, key = key, current_discovery_key()
+            if key != previous_key:
+                rediscover()
+                if watch_all:
+                    obj_names = list(TESTS)
+                else:
+                    obj_names = [name for name in obj_names if name in TESTS]
+                dependents = find_dependents(obj_names)
+            previous_mtimes, mtimes = mtimes, source_mtimes(dependents)
+            changed = [
+                module
+                for module in dependents
+                if mtimes[module] != previous_mtimes.get(module)
+            ]
+            if not changed:
+                continue
+            affected = [
+                obj_name
+                for obj_name in obj_names
+                if any(obj_name in dependents[module] for module in changed)
+            ]
+            stale = set(changed).union(
+                get_test_name(obj_name).split('.')[0]
+                for obj_name in affected
+            )
+            forget_modules(stale)
+            print("\nChanged {}: testing {}\n".format(
+                ', '.join(module + '.py' for module in changed),
+                ', '.join(affected),
+            ))
+            run_forked(affected)
+            warm_up(stale)
+    except KeyboardInterrupt:
+        print()
+
+
+def find_dependents(obj_names):
+    """Return the exercises in obj_names that depend on each module."""
+    dependents = OrderedDict()
+    for obj_name in obj_names:
+        for module in source_modules(obj_name):
+            dependents.setdefault(module, []).append(obj_name)
+    return dependents
+
+
+def current_discovery_key():
+    """Return test_data's discovery key, or None if files changed mid-scan."""
+    try:
+        return test_data.discovery_key()
+    except OSError:
+        return None
+
+
+def rediscover():
+    """Update TESTS and MODULES in place from the current test files."""
+    tests, modules = test_data.discover()
+    TESTS.clear()
+    TESTS.update(tests)
+    MODULES.clear()
+    MODULES.update(modules)
+
+
+def source_modules(obj_name):
+    """Return the names of the modules the tests for obj_name depend on."""
+    modules = [
+        module
+        for module, objects in MODULES.items()
+        if obj_name in objects
+    ]
+    modules.append(get_test_name(obj_name).split('.')[0])
+    return modules
+
+
+def source_mtimes(modules):
+    mtimes = {}
+    for module in modules:
+        try:
+            path = os.path.join(HERE, module + '.py')
+            mtimes[module] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[module] = None
+    return mtimes
+
+
+def forget_modules(modules, directory=HERE):
+    """Unload modules and delete their bytecode, so they're imported afresh.
+
+    Bytecode is only checked against the whole second its source was saved
+    in and the source's size, so it can be stale after a quick edit.
+    """
+    for module in modules:
+        sys.modules.pop(module, None)
+        path = os.path.join(directory, module + '.py')
+        try:
+            os.remove(importlib.util.cache_from_source(path))
+        except OSError:
+            pass
+    importlib.invalidate_caches()
+
+
+def warm_up(modules):
+    """Import modules ahead of time, ignoring any errors they raise."""
+    for module in modules:
+        try:
+            with redirect_stdout(io.StringIO()):
+                importlib.import_module(module)
+        except Exception:
+            pass
+
+
+def run_forked(obj_names):
+    """Run the tests for obj_names in a child process and print a report.
+
+    Where os.fork isn't available, the tests run in this process instead.
+    Errors are printed rather than raised, so watching can carry on.
+    """
+    pid = os.fork() if hasattr(os, 'fork') else None
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    status = 0
+    try:
+        start = time.perf_counter()
+        summaries = run_test_summaries(obj_names)
+        print_report(list(summaries.values()), time.perf_counter() - start)
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        if pid == 0:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+
+def parse_options(arguments):
+    """Separate command-line options from the exercise name arguments."""
+    options = {
+        'jobs': 1,
+        'cache': True,
+        'durations': None,
+        'json': None,
+        'shard': None,
+        'timings': None,
+        'combine': False,
+        'watch': False,
+    }
+    remaining = []
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument in ('-j', '--jobs'):
+            options['jobs'] = parse_count('-j', next(arguments, ''), 1)
+        elif argument.startswith('-j'):
+            options['jobs'] = parse_count('-j', argument[2:], 1)
+        elif argument == '--no-cache':
+            options['cache'] = False
+        elif argument == '--durations':
+            options['durations'] = parse_count(argument, next(arguments, ''))
+        elif argument in ('--json', '--timings'):
+            options[argument[2:]] = next(arguments, None)
+            if not options[argument[2:]]:
+                raise SystemExit("{} needs a file name.".format(argument))
+        elif argument == '--shard':
+            options['shard'] = parse_shard(next(arguments, ''))
+        elif argument in ('--combine', '--watch'):
+            options[argument[2:]] = True
+        else:
+            remaining.append(argument)
+    return options, remaining
+
+
+def parse_count(option, value, minimum=0):
+    if not value.isdigit() or int(value) < minimum:
+        raise SystemExit("{} needs a number of at least {}.".format(
+            option, minimum,
+        ))
+    return int(value)
+
+
+def parse_shard(value):
+    shard, _, shard_count = value.partition('/')
+    if not (shard.isdigit() and shard_count.isdigit()
+            and 1 <= int(shard) <= int(shard_count)):
+        raise SystemExit("--shard needs a shard number and count, like 2/4.")
+    return int(shard), int(shard_count)
 
 
 def print_object_names():
@@ -26,7 +648,12 @@ def print_object_names():
 
 
 def main(*arguments):
-    if not arguments:
+    options, arguments = parse_options(arguments)
+    if options['combine']:
+        combine_reports(arguments, options['json'])
+    elif options['watch'] and arguments in ([], ['--all']):
+        watch()
+    elif not arguments:
         print("Please select a thing to test")
         print_object_names()
     elif len(arguments) > 1:
@@ -38,6 +665,14 @@ Examples:
 - python test.py get_hypotenuse
 - python test.py hello.py
 - python test.py BankAccount
+- python test.py --all -j 4  (run every exercise's tests in 4 processes)
+- python test.py --all --no-cache  (re-run tests for unchanged exercises too)
+- python test.py --all --durations 10  (show the 10 slowest tests)
+- python test.py --all --json report.json  (save each test's outcome and time)
+- python test.py --all --shard 2/4 --timings report.json --json shard2.json
+  (run the second quarter of the exercises, balanced by earlier timings)
+- python test.py --combine shard1.json shard2.json  (report on all shards)
+- python test.py --watch  (re-run affected tests whenever a file is saved)
 
 This test script runs Trey's tests against your code.
 The tests are written in files that end in "_test.py".
@@ -64,19 +699,43 @@ for help when you get stuck.
             arguments = list(TESTS)
         else:
             arguments = [argument]
-        tests = [
-            get_test(arg)
+        if options['shard']:
+            timings = None
+            if options['timings']:
+                timings = load_timings(options['timings'])
+            arguments = select_shard(arguments, *options['shard'], timings)
+            print("Shard {}/{}".format(*options['shard']), end=': ')
+        test_names = OrderedDict.fromkeys(
+            get_test_name(arg)
             for arg in arguments
-        ]
-        print("Testing {}\n".format(', '.join(arguments)))
-        test_classes = set(
-            tuple(test.id().split('.')[:-1])
-            for suite in tests
-            for test in suite._tests
         )
-        for module, cls in test_classes:
+        print("Testing {}\n".format(', '.join(arguments)))
+        for test_name in test_names:
+            module, cls = test_name.split('.')
             print("Running {} test class in {}.py\n".format(cls, module))
-        run_tests(tests)
+        if options['watch']:
+            watch(arguments)
+            return
+        cache = None
+        if argument == '--all' and options['cache']:
+            cache = load_cache()
+        timed = options['durations'] is not None or options['json']
+        if cache is None and options['jobs'] == 1 and not timed:
+            if not run_tests([get_test(arg) for arg in arguments]):
+                sys.exit(1)
+            return
+        start = time.perf_counter()
+        summaries = run_test_summaries(arguments, options['jobs'], cache)
+        time_taken = time.perf_counter() - start
+        successful = print_report(list(summaries.values()), time_taken)
+        if cache is not None:
+            save_cache(cache)
+        if options['durations'] is not None:
+            print_durations(summaries, options['durations'])
+        if options['json']:
+            write_json_report(summaries, options['json'], time_taken)
+        if not successful:
+            sys.exit(1)
 
 
 if __name__ == "__main__":
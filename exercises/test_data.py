@@ -1,45 +1,149 @@
-TESTS = {
-    "allow_snake": "decorators_test.AllowSnakeTests",
-    "count_calls": "decorators_test.CountCallsTests",
-    "overload": "decorators_test.OverloadTests",
-    "positional_only": "decorators_test.PositionalOnlyTests",
-    "record_calls": "decorators_test.RecordCallsTests",
-    "alias": "descriptors_test.AliasTests",
-    "class_only_method": "descriptors_test.ClassOnlyMethodTests",
-    "class_property": "descriptors_test.ClassPropertyTests",
-    "computed_property": "descriptors_test.ComputedPropertyTests",
-    "is_ok": "initial_test.InitialTests",
-    "Hashable": "metaclasses_test.HashableTests",
-    "InstanceTracker": "metaclasses_test.InstanceTrackerTests",
-    "Mapping": "metaclasses_test.MappingTests",
-    "NoMethodCollisions": "metaclasses_test.NoMethodCollisionsTests",
-    "SnakeTestCase": "metaclasses_test.SnakeTestCaseTests",
-    "UnsubclassableType": "metaclasses_test.UnsubclassableTypeTests"
-}
-
-MODULES = {
-    "decorators": [
-        "allow_snake",
-        "count_calls",
-        "overload",
-        "positional_only",
-        "record_calls"
-    ],
-    "descriptors": [
-        "alias",
-        "class_only_method",
-        "class_property",
-        "computed_property"
-    ],
-    "initial": [
-        "is_ok"
-    ],
-    "metaclasses": [
-        "Hashable",
-        "InstanceTracker",
-        "Mapping",
-        "NoMethodCollisions",
-        "SnakeTestCase",
-        "UnsubclassableType"
-    ]
-}
+"""Exercise names and their tests, discovered from the *_test.py files.
+
+Test files are parsed rather than imported. Importing this module writes
+the result to .test_manifest.json, which is reused until one of the test
+files changes. Test files with syntax errors are skipped with a warning,
+and the manifest isn't written until they're fixed.
+"""
+from collections import OrderedDict
+import ast
+import json
+import os
+import re
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_FILE = os.path.join(HERE, '.test_manifest.json')
+TEST_SUFFIX = '_test.py'
+TESTED_NAME_RE = re.compile(r'Tests? for (\w+)')
+
+
+def discover(directory=HERE):
+    """Return the TESTS and MODULES mappings for the tests in directory."""
+    test_files, exercise_modules = list_modules(directory)
+    key = discovery_key(directory, test_files, exercise_modules)
+    manifest = load_manifest()
+    if manifest.get('key') == key:
+        return manifest['tests'], manifest['modules']
+    tests, modules, complete = build_mappings(
+        directory, test_files, exercise_modules,
+    )
+    if complete:
+        save_manifest({'key': key, 'tests': tests, 'modules': modules})
+    return tests, modules
+
+
+def list_modules(directory=HERE):
+    """Return the test file names and the exercise module names in directory."""
+    filenames = sorted(
+        entry.name
+        for entry in os.scandir(directory)
+        if entry.name.endswith('.py') and entry.is_file()
+    )
+    test_files = [name for name in filenames if name.endswith(TEST_SUFFIX)]
+    exercise_modules = {
+        name[:-3]
+        for name in filenames
+        if not name.endswith(TEST_SUFFIX)
+    }
+    return test_files, exercise_modules
+
+
+def discovery_key(directory=HERE, test_files=None, exercise_modules=None):
+    """Return a key which changes whenever discover's result might."""
+    if test_files is None:
+        test_files, exercise_modules = list_modules(directory)
+    return [
+        [name, os.stat(os.path.join(directory, name)).st_mtime_ns]
+        for name in test_files
+    ] + sorted(exercise_modules)
+
+
+def build_mappings(directory, test_files, exercise_modules):
+    """Return TESTS, MODULES and whether every test file could be parsed."""
+    found = []
+    complete = True
+    for filename in test_files:
+        path = os.path.join(directory, filename)
+        try:
+            found_tests = list(scan_test_file(path, exercise_modules))
+        except SyntaxError as error:
+            print("Warning: skipping {} because it has a syntax error: {}".format(
+                filename, error,
+            ), file=sys.stderr)
+            complete = False
+            continue
+        found.extend(sorted(
+            found_tests,
+            key=lambda found_test: found_test[0].lower(),
+        ))
+    tests = OrderedDict()
+    modules = OrderedDict()
+    for name, module, test_name in found:
+        tests[name] = test_name
+        modules.setdefault(module, []).append(name)
+    for names in modules.values():
+        names.sort(key=str.lower)
+    return tests, OrderedDict(sorted(modules.items())), complete
+
+
+def scan_test_file(path, exercise_modules):
+    """Yield (name, exercise module, test name) for each TestCase in path.
+
+    The name tested by each TestCase is taken from its docstring ("Tests for
+    name.") or else from its class name (NameTests), and must be imported
+    from one of the exercise modules.
+    """
+    with open(path, 'rb') as test_file:
+        tree = ast.parse(test_file.read(), path)
+    test_module = os.path.basename(path)[:-3]
+    imported = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module in exercise_modules:
+            for alias in node.names:
+                imported[alias.asname or alias.name] = node.module
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any(map(is_test_case, node.bases)):
+            name = tested_name(node, imported)
+            if name is not None:
+                test_name = '{}.{}'.format(test_module, node.name)
+                yield name, imported[name], test_name
+
+
+def is_test_case(base):
+    if isinstance(base, ast.Attribute):
+        return base.attr == 'TestCase'
+    return isinstance(base, ast.Name) and base.id == 'TestCase'
+
+
+def tested_name(class_node, imported):
+    match = TESTED_NAME_RE.match(ast.get_docstring(class_node) or '')
+    if match and match.group(1) in imported:
+        return match.group(1)
+    for name in imported:
+        if name.replace('_', '').lower() + 'tests' == class_node.name.lower():
+            return name
+    return None
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE) as manifest_file:
+            manifest = json.load(manifest_file, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(manifest):
+    temporary_file = MANIFEST_FILE + '.tmp'
+    try:
+        with open(temporary_file, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(temporary_file, MANIFEST_FILE)
+    except OSError:
+        pass
+
+
+TESTS, MODULES = discover()
@@ -0,0 +1,51 @@
+"""Tests for test.py's watch mode (run with python -m unittest test_watch)."""
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from test import forget_modules
+
+
+class ForgetModulesTests(unittest.TestCase):
+
+    """Tests for forget_modules."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        sys.path.insert(0, self.directory)
+        self.addCleanup(sys.path.remove, self.directory)
+        self.addCleanup(sys.modules.pop, 'watched_module', None)
+        dont_write_bytecode = sys.dont_write_bytecode
+        self.addCleanup(setattr, sys, 'dont_write_bytecode', dont_write_bytecode)
+        sys.dont_write_bytecode = False
+
+    def save(self, source, mtime_ns):
+        path = os.path.join(self.directory, 'watched_module.py')
+        with open(path, 'w') as module_file:
+            module_file.write(source)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_same_size_save_within_one_second(self):
+        self.save("VALUE = 'AAA'\n", 1700000000100000000)
+        importlib.invalidate_caches()
+        self.assertEqual(importlib.import_module('watched_module').VALUE, 'AAA')
+        self.save("VALUE = 'BBB'\n", 1700000000600000000)
+        forget_modules(['watched_module'], self.directory)
+        self.assertEqual(importlib.import_module('watched_module').VALUE, 'BBB')
+
+    def test_module_without_bytecode(self):
+        sys.dont_write_bytecode = True
+        self.save("VALUE = 1\n", 1700000000100000000)
+        importlib.invalidate_caches()
+        self.assertEqual(importlib.import_module('watched_module').VALUE, 1)
+        self.save("VALUE = 2\n", 1700000000600000000)
+        forget_modules(['watched_module'], self.directory)
+        self.assertEqual(importlib.import_module('watched_module').VALUE, 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)